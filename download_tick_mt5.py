@@ -1,59 +1,182 @@
 # Script: download_ticks_by_date.py
 import MetaTrader5 as mt5
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Thread
+from datetime import datetime, timedelta, timezone
 import time
 import os
 
+# Filas por bloque que formatea el escritor CSV de Arrow
+CSV_BATCH_SIZE = 1 << 16
+# Buffer de escritura de los CSV (evita millones de escrituras pequeñas)
+WRITE_BUFFER_SIZE = 16 << 20
+# Filas por row group en los archivos Parquet
+PARQUET_ROW_GROUP_SIZE = 1_000_000
+# Filas por bloque al volcar a disco los ticks guardados en un memmap
+MEMMAP_BLOCK_ROWS = 1_000_000
+# Límites del tamaño adaptativo de los lotes de descarga
+MIN_BATCH_STRIDE = timedelta(hours=1)
+MAX_BATCH_STRIDE = timedelta(days=30)
+# Intervalo mínimo y máximo (s) entre rondas de peticiones a MT5
+MIN_REQUEST_INTERVAL = 0.01
+MAX_REQUEST_INTERVAL = 1.0
+# Rangos más largos que esto (días) se descargan por lotes sin intentar la descarga completa
+DIRECT_DOWNLOAD_MAX_DAYS = 30
+# Lotes que pueden esperar al hilo escritor antes de frenar la descarga
+WRITE_QUEUE_SIZE = 4
+# Tipos reducidos para los campos de tick que no son precios
+COMPACT_TICK_DTYPES = {'flags': 'int16', 'volume': 'uint32'}
+
+def _initialize_mt5(symbol):
+    """Inicializar MT5 y seleccionar el símbolo (cierra la conexión si falla)"""
+    if not mt5.initialize():
+        print("Error al inicializar MT5")
+        return False
+    
+    if not mt5.symbol_select(symbol, True):
+        print(f"Error: Símbolo {symbol} no disponible")
+        mt5.shutdown()
+        return False
+        
+    return True
+
+def _utc_datetime(epoch):
+    """Datetime UTC sin zona horaria a partir de segundos epoch (sin utcfromtimestamp)"""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
+
+def _wait_remaining(started, interval):
+    """Dormir solo lo que falte para que pasen `interval` segundos desde `started`"""
+    elapsed = time.monotonic() - started
+    if elapsed < interval:
+        time.sleep(interval - elapsed)
+
+def _ticks_to_table(ticks, compact=False):
+    """Construir una tabla Arrow directamente desde el array estructurado de ticks
+
+    Cada campo se pasa a Arrow sin construir un DataFrame intermedio; 'time'
+    se interpreta como timestamp en segundos. Con compact=True los campos de
+    COMPACT_TICK_DTYPES se guardan con tipos más pequeños (nunca los precios).
+    """
+    names = list(ticks.dtype.names)
+    arrays = []
+    for name in names:
+        column = ticks[name]
+        if name == 'time':
+            arrays.append(pa.array(column, type=pa.timestamp('s')))
+            continue
+        if compact and name in COMPACT_TICK_DTYPES:
+            column = column.astype(COMPACT_TICK_DTYPES[name])
+        arrays.append(pa.array(column))
+    return pa.Table.from_arrays(arrays, names=names)
+
+def _floats_as_text(table):
+    """Formatear las columnas float con parte decimal (0.0 y no 0), como hacía pandas
+
+    Arrow escribe los float enteros sin decimales y al releer el CSV esas
+    columnas se interpretarían como enteros.
+    """
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type):
+            text = pc.cast(table.column(i), pa.string())
+            whole = pc.invert(pc.match_substring_regex(text, '[.eEnN]'))
+            text = pc.if_else(whole, pc.binary_join_element_wise(text, '.0', ''), text)
+            table = table.set_column(i, field.name, text)
+    return table
+
+def _write_csv(table, path, include_header=True, mode='wb'):
+    """Escribir una tabla Arrow como CSV con el escritor C++ de Arrow"""
+    # Cabecera y valores sin comillas, igual que los que escribía pandas (todas
+    # las columnas son numéricas o fechas, no hay nada que necesite comillas)
+    options = pacsv.WriteOptions(include_header=include_header, batch_size=CSV_BATCH_SIZE,
+                                 quoting_header='none', quoting_style='none')
+    with open(path, mode, buffering=WRITE_BUFFER_SIZE) as fh:
+        pacsv.write_csv(_floats_as_text(table), fh, write_options=options)
+
 class TickDownloader:
-    def __init__(self, symbol, start_date, end_date=None, max_ticks_per_batch=100000000):
+    def __init__(self, symbol, start_date, end_date=None, max_ticks_per_batch=100000000, stream_file=None,
+                 max_workers=4, compact=True, initialized_externally=False, memmap_file=None):
         self.symbol = symbol
         self.start_date = start_date
         self.end_date = end_date if end_date else datetime.now()
         self.max_ticks_per_batch = max_ticks_per_batch
         self.downloaded_ticks = 0
         self.all_ticks = None  # Inicializar como None en lugar de lista vacía
+        # Si se indica stream_file, cada lote se escribe directamente en ese CSV
+        # y no se conservan los ticks en memoria
+        self.stream_file = stream_file
+        self._stream_part_file = stream_file  # Ruta original; _finish_stream renombra stream_file
+        self.first_tick_time = None  # Epoch (s) del primer tick descargado
+        self.last_tick_time = None   # Epoch (s) del último tick descargado
+        self.max_workers = max_workers  # Peticiones simultáneas a MT5 al descargar por lotes
+        self._table = None  # Tabla Arrow de all_ticks ordenada por tiempo (ver _as_table)
+        self.compact = compact  # Guardar flags/volume con tipos más pequeños
+        self._write_queue = None   # Cola hacia el hilo escritor en modo streaming
+        self._writer_error = None  # Excepción producida en el hilo escritor
+        # Si MT5 ya lo inicializa quien llama, no se abre ni se cierra la conexión aquí
+        self.initialized_externally = initialized_externally
+        # Si se indica memmap_file, los lotes se copian a un np.memmap en disco en
+        # lugar de a RAM, para rangos que no caben en memoria. El archivo es
+        # temporal: hay que llamar a release_memmap() al terminar de usar los ticks
+        self.memmap_file = memmap_file
+        self._memmap = None
+        self._memmap_offset = 0
         
     def initialize_mt5(self):
         """Inicializar MT5"""
-        if not mt5.initialize():
-            print("Error al inicializar MT5")
-            return False
-        
-        if not mt5.symbol_select(self.symbol, True):
-            print(f"Error: Símbolo {self.symbol} no disponible")
-            mt5.shutdown()
-            return False
-            
-        return True
+        return _initialize_mt5(self.symbol)
     
     def get_ticks_by_date_range(self, start_date, end_date):
         """Obtener ticks en un rango de fechas específico"""
+        print(f"📅 Descargando: {start_date.strftime('%Y-%m-%d %H:%M')} - {end_date.strftime('%Y-%m-%d %H:%M')}")
+        ticks, error = self._fetch_ticks(start_date, end_date)
+        self._report_ticks(ticks, error)
+        return ticks
+    
+    def _fetch_ticks(self, start_date, end_date):
+        """Pedir los ticks de un rango a MT5 sin imprimir nada (se usa desde los hilos del pool)
+        
+        Devuelve (ticks, error); ticks es None si MT5 no devolvió datos.
+        """
         try:
-            print(f"📅 Descargando: {start_date.strftime('%Y-%m-%d %H:%M')} - {end_date.strftime('%Y-%m-%d %H:%M')}")
-            ticks = mt5.copy_ticks_range(self.symbol, start_date, end_date, mt5.COPY_TICKS_ALL)
-            
-            if ticks is None:
-                print("   ⚠️  No se encontraron ticks")
-                return None
-                
-            print(f"   ✅ {len(ticks):,} ticks encontrados")
-            return ticks
-            
+            return mt5.copy_ticks_range(self.symbol, start_date, end_date, mt5.COPY_TICKS_ALL), None
         except Exception as e:
-            print(f"❌ Error al obtener ticks: {e}")
-            return None
+            return None, e
+    
+    def _report_ticks(self, ticks, error):
+        """Mostrar el resultado de _fetch_ticks"""
+        if error is not None:
+            print(f"❌ Error al obtener ticks: {error}")
+        elif ticks is None:
+            print("   ⚠️  No se encontraron ticks")
+        else:
+            print(f"   ✅ {len(ticks):,} ticks encontrados")
     
     def download_by_date_range(self):
         """Descargar ticks por rango de fechas completo"""
-        if not self.initialize_mt5():
+        if not self.initialized_externally and not self.initialize_mt5():
             return False
         
         try:
             print(f"🎯 Iniciando descarga desde {self.start_date} hasta {self.end_date}")
             print(f"📊 Símbolo: {self.symbol}")
             
+            # En modo streaming o memmap se va directamente por lotes para acotar la memoria
+            if self.stream_file or self.memmap_file:
+                return self.download_in_batches()
+            
+            # En rangos largos la descarga completa reservaría gigas en MT5 para
+            # acabar fallando; se va directamente por lotes
+            if (self.end_date - self.start_date).days > DIRECT_DOWNLOAD_MAX_DAYS:
+                print(f"📦 Rango de más de {DIRECT_DOWNLOAD_MAX_DAYS} días, descargando por lotes...")
+                return self.download_in_batches()
+            
             # Intentar descarga completa primero
             print("🔄 Intentando descarga completa del rango...")
             all_ticks = self.get_ticks_by_date_range(self.start_date, self.end_date)
@@ -61,6 +184,7 @@ class TickDownloader:
             if all_ticks is not None and len(all_ticks) > 0:
                 print(f"✅ Descarga completa exitosa: {len(all_ticks):,} ticks")
                 self.all_ticks = all_ticks
+                self._table = None
                 self.downloaded_ticks = len(all_ticks)
                 return True
             
@@ -74,93 +198,346 @@ class TickDownloader:
             traceback.print_exc()
             return False
         finally:
-            mt5.shutdown()
+            if not self.initialized_externally:
+                mt5.shutdown()
     
-    def download_in_batches(self):
-        """Descargar ticks en lotes por intervalos de tiempo"""
-        current_end = self.end_date
-        batch_number = 0
-        all_ticks_list = []
+    def _collect_batch(self, ticks, batches, window):
+        """Guardar un lote descargado (en memoria, en el memmap o en el CSV de streaming)"""
+        if self.stream_file:
+            # La cabecera ya está escrita si ya se había recibido algún tick; la
+            # escritura la hace el hilo escritor mientras se sigue descargando
+            self._write_queue.put((ticks, self.first_tick_time is not None))
+        elif self.memmap_file:
+            self._store_in_memmap(ticks, window)
+        else:
+            batches.append((ticks, len(ticks)))
+        self.downloaded_ticks += len(ticks)
         
-        # Empezar desde la fecha final y retroceder
-        while current_end > self.start_date:
-            batch_number += 1
-            
-            # Calcular fecha de inicio del lote (1 día antes del current_end)
-            batch_start = current_end - timedelta(days=1)
-            if batch_start < self.start_date:
-                batch_start = self.start_date
-            
-            print(f"\n📦 Lote #{batch_number}: {batch_start.strftime('%Y-%m-%d')} a {current_end.strftime('%Y-%m-%d')}")
-            
-            # Descargar lote actual
-            ticks = self.get_ticks_by_date_range(batch_start, current_end)
-            
-            if ticks is not None and len(ticks) > 0:
-                all_ticks_list.append(ticks)
-                self.downloaded_ticks += len(ticks)
-                print(f"   ✅ {len(ticks):,} ticks descargados | Total: {self.downloaded_ticks:,}")
-            else:
-                print("   ⚠️  No hay ticks en este período")
-            
-            # Mover al período anterior
-            current_end = batch_start
-            
-            # Pequeña pausa para no sobrecargar
-            time.sleep(0.1)
-            
-            # Verificar si hemos alcanzado la fecha de inicio
-            if current_end <= self.start_date:
+        # Los ticks de cada lote vienen ordenados por tiempo
+        if self.first_tick_time is None:
+            self.first_tick_time = int(ticks['time'][0])
+        self.last_tick_time = int(ticks['time'][-1])
+        print(f"   ✅ {len(ticks):,} ticks descargados | Total: {self.downloaded_ticks:,}")
+    
+    def _store_in_memmap(self, ticks, window):
+        """Copiar un lote al memmap en disco, ampliándolo si la estimación se queda corta"""
+        n = len(ticks)
+        if self._memmap is None:
+            # Estimar el total a partir de la densidad de ticks del primer lote
+            total_seconds = (self.end_date - self.start_date).total_seconds()
+            capacity = int(n * total_seconds / max(window.total_seconds(), 1) * 1.2) + n
+            self._memmap = np.memmap(self.memmap_file, dtype=ticks.dtype, mode='w+', shape=(capacity,))
+            self._memmap_offset = 0
+        elif self._memmap_offset + n > len(self._memmap):
+            # Reabrir con el doble de tamaño; numpy amplía el archivo en modo 'r+'
+            capacity = max(2 * len(self._memmap), self._memmap_offset + n)
+            dtype = self._memmap.dtype
+            self._memmap.flush()
+            self._memmap = None  # Cerrar el mapeo antes de ampliar el archivo
+            self._memmap = np.memmap(self.memmap_file, dtype=dtype, mode='r+', shape=(capacity,))
+        
+        offset = self._memmap_offset
+        self._memmap[offset:offset + n] = ticks
+        self._memmap_offset = offset + n
+    
+    def release_memmap(self):
+        """Cerrar el memmap de ticks y borrar su archivo temporal"""
+        if isinstance(self.all_ticks, np.memmap):
+            self.all_ticks = None
+            self._table = None
+        self._memmap = None  # Sin referencias el mapeo se cierra y el archivo se puede borrar
+        self._memmap_offset = 0
+        if self.memmap_file and os.path.exists(self.memmap_file):
+            os.remove(self.memmap_file)
+    
+    def _writer_loop(self):
+        """Hilo escritor: añade al CSV los lotes recibidos hasta encontrar None"""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
                 break
+            if self._writer_error is not None:
+                continue  # Seguir vaciando la cola para no bloquear la descarga
+            ticks, wrote_header = item
+            try:
+                self._append_batch_to_csv(ticks, self.stream_file, wrote_header)
+            except Exception as e:
+                self._writer_error = e
+    
+    def _combine_batches(self, batches):
+        """Combinar los lotes en memoria en self.all_ticks"""
+        if self._writer_error is not None:
+            print(f"❌ Error al escribir {self.stream_file}: {self._writer_error}")
+            return False
+        
+        if self.stream_file and self.first_tick_time is not None:
+            print(f"\n✅ Descarga por lotes completada: {self.downloaded_ticks:,} ticks escritos en {self.stream_file}")
+            return True
         
-        if all_ticks_list:
-            # Combinar todos los ticks
-            self.all_ticks = np.concatenate(all_ticks_list)
+        if self._memmap is not None:
+            # Recortar el archivo a lo realmente escrito (sobra la parte estimada
+            # de más); hay que cerrar el mapeo antes de truncarlo
+            dtype = self._memmap.dtype
+            self._memmap.flush()
+            self._memmap = None
+            with open(self.memmap_file, 'r+b') as fh:
+                fh.truncate(self._memmap_offset * dtype.itemsize)
+            
+            # El SO pagina el archivo según se lee
+            self.all_ticks = np.memmap(self.memmap_file, dtype=dtype, mode='r+', shape=(self._memmap_offset,))
+            self._table = None
+            print(f"\n✅ Descarga por lotes completada: {len(self.all_ticks):,} ticks en {self.memmap_file}")
+            return True
+        
+        if batches:
+            # Combinar todos los ticks en un único buffer preasignado
+            # (evita la copia extra y el pico de memoria de np.concatenate)
+            total = sum(n for _, n in batches)
+            self.all_ticks = np.empty(total, dtype=batches[0][0].dtype)
+            self._table = None
+            offset = 0
+            for i, (ticks, n) in enumerate(batches):
+                self.all_ticks[offset:offset + n] = ticks
+                offset += n
+                batches[i] = None  # Liberar el lote en cuanto se ha copiado
             print(f"\n✅ Descarga por lotes completada: {len(self.all_ticks):,} ticks")
             return True
         
         print("❌ No se encontraron ticks en el rango especificado")
         return False
     
+    def download_in_batches(self):
+        """Descargar ticks en lotes por intervalos de tiempo"""
+        batches = []  # Pares (ticks, n) pendientes de copiar al buffer final
+        
+        # Empezar de cero si la instancia ya se había usado
+        self.downloaded_ticks = 0
+        self.first_tick_time = None
+        self.last_tick_time = None
+        if self.stream_file:
+            self.stream_file = self._stream_part_file
+        if self.memmap_file:
+            self.release_memmap()
+        
+        # En modo streaming la escritura del CSV se solapa con la descarga; la
+        # cola acotada frena la descarga si el escritor se queda atrás
+        writer = None
+        if self.stream_file:
+            self._write_queue = Queue(maxsize=WRITE_QUEUE_SIZE)
+            self._writer_error = None
+            writer = Thread(target=self._writer_loop, daemon=True)
+            writer.start()
+        
+        try:
+            self._download_windows(batches)
+        finally:
+            if writer is not None:
+                self._write_queue.put(None)
+                writer.join()
+        
+        return self._combine_batches(batches)
+    
+    def _download_windows(self, batches):
+        """Recorrer el rango con lotes de tamaño adaptativo, varios a la vez"""
+        next_start = self.start_date
+        stride = timedelta(days=1)
+        failed_stride = None  # Menor tamaño de lote que MT5 no ha podido servir
+        interval = 0.1  # Separación mínima entre peticiones; se adapta a la respuesta de MT5
+        last_submit = None
+        batch_number = 0
+        pending = deque()  # (ventana, future) en orden cronológico
+        
+        # MT5 ya está inicializado en este hilo; los hilos del pool solo lanzan
+        # las peticiones copy_ticks_range, que están limitadas por la latencia
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            def submit(window):
+                nonlocal last_submit
+                if last_submit is not None:
+                    _wait_remaining(last_submit, interval)
+                last_submit = time.monotonic()
+                # Los hilos no imprimen; los mensajes salen en orden desde este hilo
+                return window, executor.submit(self._fetch_ticks, *window)
+            
+            while pending or next_start < self.end_date:
+                # Mantener hasta max_workers ventanas en vuelo con el tamaño actual
+                while len(pending) < self.max_workers and next_start < self.end_date:
+                    window = (next_start, min(next_start + stride, self.end_date))
+                    pending.append(submit(window))
+                    next_start = window[1]
+                
+                # Los resultados se procesan en orden cronológico
+                (batch_start, batch_end), future = pending.popleft()
+                ticks, error = future.result()
+                length = batch_end - batch_start
+                
+                if ticks is None and length > MIN_BATCH_STRIDE:
+                    print(f"\n📅 {batch_start.strftime('%Y-%m-%d %H:%M')} - {batch_end.strftime('%Y-%m-%d %H:%M')}")
+                    self._report_ticks(ticks, error)
+                    # MT5 no ha podido servir la ventana: partirla en dos y pedir
+                    # las mitades antes que las ventanas posteriores ya en vuelo
+                    failed_stride = length if failed_stride is None else min(failed_stride, length)
+                    half = max(length / 2, MIN_BATCH_STRIDE)
+                    stride = min(stride, half)
+                    interval = min(interval * 2, MAX_REQUEST_INTERVAL)
+                    print(f"   ↘️  Reduciendo el tamaño del lote a {stride}")
+                    middle = batch_start + half
+                    pending.appendleft(submit((middle, batch_end)))
+                    pending.appendleft(submit((batch_start, middle)))
+                    continue
+                
+                interval = max(interval / 2, MIN_REQUEST_INTERVAL)
+                batch_number += 1
+                print(f"\n📦 Lote #{batch_number}: {batch_start.strftime('%Y-%m-%d %H:%M')} a {batch_end.strftime('%Y-%m-%d %H:%M')}")
+                self._report_ticks(ticks, error)
+                
+                if ticks is not None and len(ticks) > 0:
+                    self._collect_batch(ticks, batches, length)
+                else:
+                    print("   ⚠️  No hay ticks en este período")
+                
+                # Si el lote cupo con holgura, duplicar el tamaño, pero sin volver
+                # a un tamaño que ya ha fallado
+                grown = min(stride * 2, MAX_BATCH_STRIDE)
+                fits = ticks is not None and len(ticks) < self.max_ticks_per_batch * 0.5
+                if fits and (failed_stride is None or grown < failed_stride):
+                    stride = grown
+    
+    def _append_batch_to_csv(self, ticks, path, wrote_header):
+        """Añadir un lote de ticks al CSV (crea el archivo y la cabecera en el primer lote)"""
+        _write_csv(_ticks_to_table(ticks, self.compact), path, include_header=not wrote_header,
+                   mode='ab' if wrote_header else 'wb')
+    
+    def _finish_stream(self, filename=None):
+        """Dar nombre definitivo al CSV escrito en modo streaming"""
+        if self.first_tick_time is None or not os.path.exists(self.stream_file):
+            print("❌ No hay ticks para guardar")
+            return None
+        
+        first_time = _utc_datetime(self.first_tick_time)
+        last_time = _utc_datetime(self.last_tick_time)
+        
+        if filename is None:
+            filename = f"{self.symbol}_ticks_{first_time.strftime('%Y%m%d')}_to_{last_time.strftime('%Y%m%d')}_{self.downloaded_ticks}.csv"
+        
+        if os.path.abspath(filename) != os.path.abspath(self.stream_file):
+            os.replace(self.stream_file, filename)
+            self.stream_file = filename
+        
+        file_size = os.path.getsize(filename) / (1024*1024)  # MB
+        print(f"✅ Archivo guardado: {filename}")
+        print(f"📊 Total ticks: {self.downloaded_ticks:,}")
+        print(f"📅 Rango temporal: {first_time} to {last_time}")
+        print(f"📏 Tamaño del archivo: {file_size:.2f} MB")
+        return filename
+    
+    def _as_table(self):
+        """Tabla Arrow de los ticks ordenada por tiempo, construida una sola vez por descarga"""
+        if self._table is None:
+            # Los lotes llegan en orden cronológico; solo se ordena si hace falta
+            t = self.all_ticks['time']
+            if not np.all(t[1:] >= t[:-1]):
+                self.all_ticks = self.all_ticks[np.argsort(t, kind='stable')]
+            self._table = _ticks_to_table(self.all_ticks, self.compact)
+        return self._table
+    
+    def _iter_tables(self):
+        """Tablas Arrow consecutivas con todos los ticks, en orden cronológico
+        
+        Con los ticks en RAM se devuelve la tabla cacheada de _as_table; si
+        all_ticks es un memmap se recorre por bloques para no cargarlo entero
+        (los lotes ya se escribieron en orden cronológico).
+        """
+        if isinstance(self.all_ticks, np.memmap):
+            for i in range(0, len(self.all_ticks), MEMMAP_BLOCK_ROWS):
+                yield _ticks_to_table(self.all_ticks[i:i + MEMMAP_BLOCK_ROWS], self.compact)
+        else:
+            yield self._as_table()
+    
+    def _time_range(self):
+        """Primer y último instante de all_ticks"""
+        if not isinstance(self.all_ticks, np.memmap):
+            self._as_table()  # Ordena all_ticks si hace falta
+        t = self.all_ticks['time']
+        return _utc_datetime(int(t[0])), _utc_datetime(int(t[-1]))
+    
     def save_ticks_to_csv(self, filename=None):
         """Guardar ticks en archivo CSV"""
-        # Verificar si hay ticks para guardar (manera correcta para arrays numpy)
-        if self.all_ticks is None or (hasattr(self.all_ticks, 'size') and self.all_ticks.size == 0):
+        # En modo streaming los ticks ya están en disco
+        if self.stream_file:
+            return self._finish_stream(filename)
+        
+        if self.all_ticks is None or len(self.all_ticks) == 0:
             print("❌ No hay ticks para guardar")
             return None
         
-        if len(self.all_ticks) == 0:
-            print("❌ Array de ticks está vacío")
+        n = len(self.all_ticks)
+        first_time, last_time = self._time_range()
+        
+        # Crear nombre de archivo descriptivo
+        if filename is None:
+            first_date = first_time.strftime('%Y%m%d')
+            last_date = last_time.strftime('%Y%m%d')
+            filename = f"{self.symbol}_ticks_{first_date}_to_{last_date}_{n}.csv"
+        
+        # Guardar en CSV (la cabecera solo con el primer bloque)
+        print(f"💾 Guardando {n:,} ticks en archivo CSV...")
+        try:
+            for i, table in enumerate(self._iter_tables()):
+                _write_csv(table, filename, include_header=(i == 0), mode='ab' if i else 'wb')
+        except (OSError, ValueError) as e:
+            print(f"❌ Error al escribir {filename}: {e}")
+            return None
+        
+        # Verificar que el archivo se creó correctamente (un solo stat)
+        try:
+            file_size = os.stat(filename).st_size / (1024*1024)  # MB
+        except OSError:
+            print("❌ Error: El archivo no se creó correctamente")
+            return None
+        
+        print(f"✅ Archivo guardado: {filename}")
+        print(f"📊 Total ticks: {n:,}")
+        print(f"📅 Rango temporal: {first_time} to {last_time}")
+        print(f"📏 Tamaño del archivo: {file_size:.2f} MB")
+        return filename
+    
+    def save_ticks_to_parquet(self, filename=None):
+        """Guardar ticks en archivo Parquet (zstd)"""
+        if self.stream_file:
+            print("❌ En modo streaming los ticks se guardan solo en CSV")
+            return None
+        
+        if self.all_ticks is None or len(self.all_ticks) == 0:
+            print("❌ No hay ticks para guardar")
             return None
         
         try:
-            # Convertir a DataFrame
-            df = pd.DataFrame(self.all_ticks)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
-            df = df.sort_values('time')
+            n = len(self.all_ticks)
+            first_time, last_time = self._time_range()
             
-            # Crear nombre de archivo descriptivo
             if filename is None:
-                first_date = df['time'].min().strftime('%Y%m%d')
-                last_date = df['time'].max().strftime('%Y%m%d')
-                filename = f"{self.symbol}_ticks_{first_date}_to_{last_date}_{len(df)}.csv"
+                first_date = first_time.strftime('%Y%m%d')
+                last_date = last_time.strftime('%Y%m%d')
+                filename = f"{self.symbol}_ticks_{first_date}_to_{last_date}_{n}.parquet"
             
-            # Guardar en CSV
-            print(f"💾 Guardando {len(df):,} ticks en archivo CSV...")
-            df.to_csv(filename, index=False)
+            print(f"💾 Guardando {n:,} ticks en archivo Parquet...")
+            writer = None
+            try:
+                for table in self._iter_tables():
+                    if writer is None:
+                        writer = pq.ParquetWriter(filename, table.schema, compression='zstd',
+                                                  compression_level=3, use_dictionary=False)
+                    writer.write_table(table, row_group_size=PARQUET_ROW_GROUP_SIZE)
+            finally:
+                if writer is not None:
+                    writer.close()
+            
+            file_size = os.path.getsize(filename) / (1024*1024)  # MB
+            print(f"✅ Archivo guardado: {filename}")
+            print(f"📊 Total ticks: {n:,}")
+            print(f"📏 Tamaño del archivo: {file_size:.2f} MB")
+            return filename
             
-            # Verificar que el archivo se creó correctamente
-            if os.path.exists(filename):
-                file_size = os.path.getsize(filename) / (1024*1024)  # MB
-                print(f"✅ Archivo guardado: {filename}")
-                print(f"📊 Total ticks: {len(df):,}")
-                print(f"📅 Rango temporal: {df['time'].min()} to {df['time'].max()}")
-                print(f"📏 Tamaño del archivo: {file_size:.2f} MB")
-                return filename
-            else:
-                print("❌ Error: El archivo no se creó correctamente")
-                return None
-                
         except Exception as e:
             print(f"❌ Error al guardar el archivo: {e}")
             import traceback
@@ -169,47 +546,72 @@ class TickDownloader:
     
     def show_statistics(self):
         """Mostrar estadísticas de los ticks descargados"""
+        if self.stream_file and self.first_tick_time is not None:
+            # Sin ticks en memoria: resumen a partir de los contadores incrementales
+            first_time = _utc_datetime(self.first_tick_time)
+            last_time = _utc_datetime(self.last_tick_time)
+            print("\n📈 ESTADÍSTICAS (modo streaming):")
+            print("=" * 50)
+            print(f"   • Total ticks descargados: {self.downloaded_ticks:,}")
+            print(f"   • Período completo: {first_time} to {last_time}")
+            print(f"   • Duración total: {(last_time - first_time).days} días")
+            return
+        
         if self.all_ticks is None or len(self.all_ticks) == 0:
             print("❌ No hay datos para mostrar estadísticas")
             return
         
         try:
-            df = pd.DataFrame(self.all_ticks)
-            df['time'] = pd.to_datetime(df['time'], unit='s')
+            # Reducciones directas sobre los campos del array estructurado (sin DataFrame)
+            t = self.all_ticks['time']
+            bid = self.all_ticks['bid']
+            ask = self.all_ticks['ask']
+            volume = self.all_ticks['volume']
+            n = len(self.all_ticks)
+            
+            first_time = _utc_datetime(int(t.min()))
+            last_time = _utc_datetime(int(t.max()))
             
             print("\n📈 ESTADÍSTICAS DETALLADAS:")
             print("=" * 50)
-            print(f"   • Total ticks descargados: {len(df):,}")
-            print(f"   • Período completo: {df['time'].min()} to {df['time'].max()}")
-            print(f"   • Duración total: {(df['time'].max() - df['time'].min()).days} días")
+            print(f"   • Total ticks descargados: {n:,}")
+            print(f"   • Período completo: {first_time} to {last_time}")
+            print(f"   • Duración total: {(last_time - first_time).days} días")
             
             # Calcular ticks por día
-            if len(df) > 0:
-                days = (df['time'].max() - df['time'].min()).days or 1
-                ticks_per_day = len(df) / days
-                ticks_per_hour = ticks_per_day / 24
-                ticks_per_minute = ticks_per_hour / 60
-                
-                print(f"   • Ticks por día: {ticks_per_day:,.0f}")
-                print(f"   • Ticks por hora: {ticks_per_hour:,.0f}")
-                print(f"   • Ticks por minuto: {ticks_per_minute:,.1f}")
+            days = (last_time - first_time).days or 1
+            ticks_per_day = n / days
+            ticks_per_hour = ticks_per_day / 24
+            ticks_per_minute = ticks_per_hour / 60
+            
+            print(f"   • Ticks por día: {ticks_per_day:,.0f}")
+            print(f"   • Ticks por hora: {ticks_per_hour:,.0f}")
+            print(f"   • Ticks por minuto: {ticks_per_minute:,.1f}")
             
             # Estadísticas de precios
-            print(f"   • Precio Bid mínimo: {df['bid'].min():.5f}")
-            print(f"   • Precio Bid máximo: {df['bid'].max():.5f}")
-            print(f"   • Precio Ask mínimo: {df['ask'].min():.5f}")
-            print(f"   • Precio Ask máximo: {df['ask'].max():.5f}")
-            print(f"   • Spread promedio: {(df['ask'] - df['bid']).mean() * 10000:.1f} pips")
+            # El spread se acumula por bloques para no crear un temporal de N
+            # elementos (all_ticks puede ser un memmap mayor que la RAM)
+            spread_sum = 0.0
+            for i in range(0, n, MEMMAP_BLOCK_ROWS):
+                block = slice(i, i + MEMMAP_BLOCK_ROWS)
+                spread_sum += float(np.subtract(ask[block], bid[block], dtype=np.float64).sum())
+            spread_mean = spread_sum / n
+            print(f"   • Precio Bid mínimo: {bid.min():.5f}")
+            print(f"   • Precio Bid máximo: {bid.max():.5f}")
+            print(f"   • Precio Ask mínimo: {ask.min():.5f}")
+            print(f"   • Precio Ask máximo: {ask.max():.5f}")
+            print(f"   • Spread promedio: {spread_mean * 10000:.1f} pips")
             
             # Volumen
-            print(f"   • Volumen total: {df['volume'].sum():,}")
-            print(f"   • Volumen promedio por tick: {df['volume'].mean():.2f}")
+            print(f"   • Volumen total: {int(volume.sum()):,}")
+            print(f"   • Volumen promedio por tick: {volume.mean():.2f}")
             
         except Exception as e:
             print(f"❌ Error al calcular estadísticas: {e}")
 
 # Función principal simplificada
-def download_ticks_by_date(symbol, start_date, end_date=None, output_file=None):
+def download_ticks_by_date(symbol, start_date, end_date=None, output_file=None, stream=False, file_format='csv',
+                           initialized_externally=False, memmap_file=None):
     """
     Función simple para descargar ticks por fechas
     
@@ -218,21 +620,42 @@ def download_ticks_by_date(symbol, start_date, end_date=None, output_file=None):
         start_date (datetime): Fecha de inicio
         end_date (datetime): Fecha de fin (opcional, por defecto ahora)
         output_file (str): Nombre del archivo de salida (opcional)
+        stream (bool): Escribir cada lote directamente al CSV sin guardar todos los ticks en memoria
+        file_format (str): 'csv' o 'parquet' (no compatible con stream)
+        initialized_externally (bool): MT5 ya está inicializado y el símbolo seleccionado
+        memmap_file (str): Archivo temporal donde acumular los ticks en disco en vez de en RAM;
+            se borra al terminar (opcional)
     """
     
-    downloader = TickDownloader(symbol, start_date, end_date)
+    if stream and file_format == 'parquet':
+        print("❌ El modo streaming solo puede guardar en CSV")
+        return None
     
-    if downloader.download_by_date_range():
-        filename = downloader.save_ticks_to_csv(output_file)
-        if filename:
-            downloader.show_statistics()
-            return filename
+    stream_file = None
+    if stream:
+        stream_file = output_file or f"{symbol}_ticks_{start_date.strftime('%Y%m%d')}.csv.part"
+    
+    downloader = TickDownloader(symbol, start_date, end_date, stream_file=stream_file,
+                                initialized_externally=initialized_externally, memmap_file=memmap_file)
+    
+    try:
+        if downloader.download_by_date_range():
+            if file_format == 'parquet':
+                filename = downloader.save_ticks_to_parquet(output_file)
+            else:
+                filename = downloader.save_ticks_to_csv(output_file)
+            if filename:
+                downloader.show_statistics()
+                return filename
+            else:
+                print("❌ Error al guardar el archivo")
+                return None
         else:
-            print("❌ Error al guardar el archivo")
+            print("❌ La descarga falló")
             return None
-    else:
-        print("❌ La descarga falló")
-        return None
+    finally:
+        if memmap_file:
+            downloader.release_memmap()
 
 # Ejemplos de uso
 if __name__ == "__main__":
@@ -365,17 +788,25 @@ if __name__ == "__main__":
             (datetime(2025, 12, 1), datetime(2025, 12, 31), "DICIEMBRE_2025"),
         ]
         
-        for start, end, name in periods:
-            print(f"\n{'='*60}")
-            print(f"📥 Descargando {name}...")
-            print(f"{'='*60}")
-            filename = f"{SYMBOL}_{name}.csv"
-            result = download_ticks_by_date(SYMBOL, start, end, filename)
-            if result:
-                print(f"✅ {name} completado: {result}")
-            else:
-                print(f"❌ {name} falló")
-            time.sleep(1)  # Pausa entre descargas
+        # Una sola conexión con MT5 para todos los períodos
+        if not _initialize_mt5(SYMBOL):
+            return
+        
+        try:
+            for start, end, name in periods:
+                period_started = time.monotonic()
+                print(f"\n{'='*60}")
+                print(f"📥 Descargando {name}...")
+                print(f"{'='*60}")
+                filename = f"{SYMBOL}_{name}.csv"
+                result = download_ticks_by_date(SYMBOL, start, end, filename, initialized_externally=True)
+                if result:
+                    print(f"✅ {name} completado: {result}")
+                else:
+                    print(f"❌ {name} falló")
+                _wait_remaining(period_started, 1)  # Pausa entre descargas (solo lo que falte)
+        finally:
+            mt5.shutdown()
     
     # Preguntar si quiere descargar múltiples períodos
     print("\n¿Quieres descargar múltiples períodos? (s/n)")
@@ -1,10 +1,19 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import MetaTrader5 as mt5
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import os
+import math
 import logging
 
+# Buffer de escritura de los CSV (evita millones de escrituras pequeñas)
+WRITE_BUFFER_SIZE = 16 << 20
+# Filas por row group en los archivos Parquet
+PARQUET_ROW_GROUP_SIZE = 1_000_000
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -29,9 +38,6 @@ def calculate_chunks(start_date, end_date, max_bars=100000):
     Returns:
         Lista de tuplas (chunk_start, chunk_end)
     """
-    chunks = []
-    current_start = start_date
-    
     # Calcular el total de minutos en el período
     total_minutes = int((end_date - start_date).total_seconds() / 60)
     
@@ -41,14 +47,14 @@ def calculate_chunks(start_date, end_date, max_bars=100000):
     
     # Calcular el tamaño de cada chunk (90% del máximo para estar seguros)
     chunk_minutes = int(max_bars * 0.9)
-    chunk_delta = timedelta(minutes=chunk_minutes)
+    n_chunks = math.ceil((end_date - start_date).total_seconds() / 60 / chunk_minutes)
     
-    while current_start < end_date:
-        chunk_end = min(current_start + chunk_delta, end_date)
-        chunks.append((current_start, chunk_end))
-        current_start = chunk_end + timedelta(minutes=1)  # Evitar solapamiento
+    # Bordes contiguos: el fin de un chunk es el inicio del siguiente, así no se
+    # pierde ninguna vela en las fronteras (los duplicados se eliminan al combinar)
+    edges = pd.date_range(start_date, periods=n_chunks + 1, freq=f'{chunk_minutes}min').to_pydatetime()
+    edges[-1] = end_date
     
-    return chunks
+    return list(zip(edges[:-1], edges[1:]))
 
 def download_chunk(symbol, timeframe, chunk_start, chunk_end):
     """
@@ -61,7 +67,7 @@ def download_chunk(symbol, timeframe, chunk_start, chunk_end):
         chunk_end: fin del chunk
     
     Returns:
-        DataFrame con los datos o None si hay error
+        Array estructurado de MT5 con las velas o None si hay error
     """
     try:
         # Convertir a formato de tiempo de MT5
@@ -75,22 +81,19 @@ def download_chunk(symbol, timeframe, chunk_start, chunk_end):
             logger.warning(f"No se pudieron descargar datos para {chunk_start} - {chunk_end}")
             return None
         
-        # Crear DataFrame
-        df = pd.DataFrame(rates)
-        if len(df) == 0:
+        if len(rates) == 0:
             return None
-            
-        # Convertir timestamp a datetime
-        df['time'] = pd.to_datetime(df['time'], unit='s')
         
-        logger.info(f"Descargado chunk {chunk_start} - {chunk_end}: {len(df)} velas")
-        return df
+        # Se devuelve el array tal cual; la conversión a DataFrame se hace una
+        # sola vez sobre los datos combinados
+        logger.info(f"Descargado chunk {chunk_start} - {chunk_end}: {len(rates)} velas")
+        return rates
         
     except Exception as e:
         logger.error(f"Error descargando chunk {chunk_start} - {chunk_end}: {str(e)}")
         return None
 
-def download_historical_data(symbol, timeframe, start_date, end_date=None, max_bars=100000):
+def download_historical_data(symbol, timeframe, start_date, end_date=None, max_bars=100000, max_workers=6):
     """
     Descargar datos históricos en chunks
     
@@ -100,6 +103,7 @@ def download_historical_data(symbol, timeframe, start_date, end_date=None, max_b
         start_date: fecha de inicio (datetime)
         end_date: fecha de fin (datetime, opcional, por defecto ahora)
         max_bars: máximo de barras por chunk
+        max_workers: número de chunks que se piden a MT5 simultáneamente
     
     Returns:
         DataFrame combinado con todos los datos
@@ -111,24 +115,47 @@ def download_historical_data(symbol, timeframe, start_date, end_date=None, max_b
     chunks = calculate_chunks(start_date, end_date, max_bars)
     logger.info(f"Se descargarán {len(chunks)} chunks de datos")
     
-    all_data = []
-    for i, (chunk_start, chunk_end) in enumerate(chunks):
-        logger.info(f"Descargando chunk {i+1}/{len(chunks)}")
-        
-        # Descargar chunk
-        chunk_data = download_chunk(symbol, timeframe, chunk_start, chunk_end)
-        
-        if chunk_data is not None and len(chunk_data) > 0:
-            all_data.append(chunk_data)
-        
-        # Pequeña pausa para no saturar MT5
-        time.sleep(0.1)
+    # Lanzar todos los chunks en un pool acotado; el cuello de botella es la
+    # latencia de cada petición a MT5, no la CPU
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(download_chunk, symbol, timeframe, chunk_start, chunk_end): i
+            for i, (chunk_start, chunk_end) in enumerate(chunks)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            logger.info(f"Chunk {futures[future]+1}/{len(chunks)} terminado ({done}/{len(chunks)})")
+            results[futures[future]] = future.result()
+    
+    # Sacar los chunks del diccionario para que all_data tenga la única referencia
+    all_data = [chunk for chunk in (results.pop(i) for i in sorted(results))
+                if chunk is not None and len(chunk) > 0]
     
     # Combinar todos los datos
     if all_data:
-        combined_data = pd.concat(all_data, ignore_index=True)
-        combined_data.sort_values('time', inplace=True)
-        combined_data.drop_duplicates('time', inplace=True)
+        # Copiar los chunks a un único buffer preasignado, liberando cada uno
+        # en cuanto se copia para no duplicar la memoria
+        total = sum(len(chunk) for chunk in all_data)
+        rates = np.empty(total, dtype=all_data[0].dtype)
+        offset = 0
+        for i, chunk in enumerate(all_data):
+            rates[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+            all_data[i] = None
+        
+        # Ordenar y eliminar duplicados sobre el array: una pasada lineal, sin
+        # tabla hash ni DataFrames intermedios. Los chunks se unen en orden, así
+        # que normalmente ya está ordenado; si no, se ordena en el propio array
+        t = rates['time']
+        if not np.all(t[1:] >= t[:-1]):
+            rates.sort(order='time', kind='stable')
+        unique = np.empty(len(rates), dtype=bool)
+        unique[0] = True
+        np.not_equal(rates['time'][1:], rates['time'][:-1], out=unique[1:])
+        rates = rates[unique]
+        
+        combined_data = pd.DataFrame(rates)
+        combined_data['time'] = combined_data['time'].values.astype('datetime64[s]')
         
         logger.info(f"Datos combinados: {len(combined_data)} velas desde {combined_data['time'].min()} hasta {combined_data['time'].max()}")
         return combined_data
@@ -139,7 +166,20 @@ def download_historical_data(symbol, timeframe, start_date, end_date=None, max_b
 def save_to_csv(df, filename):
     """Guardar DataFrame a CSV"""
     try:
-        df.to_csv(filename, index=False)
+        with open(filename, 'wb', buffering=WRITE_BUFFER_SIZE) as fh:
+            df.to_csv(fh, index=False)
+        logger.info(f"Datos guardados en {filename}")
+        return True
+    except Exception as e:
+        logger.error(f"Error guardando datos: {str(e)}")
+        return False
+
+def save_to_parquet(df, filename):
+    """Guardar DataFrame a Parquet (zstd)"""
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_table(table, filename, compression='zstd', compression_level=3,
+                       use_dictionary=False, row_group_size=PARQUET_ROW_GROUP_SIZE)
         logger.info(f"Datos guardados en {filename}")
         return True
     except Exception as e:
@@ -152,7 +192,8 @@ def main():
     symbol = "EURUSD"
     timeframe = mt5.TIMEFRAME_M1  # 1 minuto
     start_date = datetime.now() - timedelta(days=365*10)  # Último año
-    output_filename = f"{symbol}_M10_1year.csv"
+    output_format = "csv"  # "csv" o "parquet"
+    output_filename = f"{symbol}_M10_1year.{output_format}"
     max_bars_per_chunk = 100000  # Ajustar según las limitaciones de MT5
     
     # Inicializar MT5
@@ -166,7 +207,8 @@ def main():
         
         if data is not None:
             # Guardar datos
-            if save_to_csv(data, output_filename):
+            save = save_to_parquet if output_format == "parquet" else save_to_csv
+            if save(data, output_filename):
                 logger.info("Descarga completada exitosamente")
             else:
                 logger.error("Error al guardar los datos")